@@ -12,14 +12,15 @@ import sys
 import smtplib
 import calendar
 import re
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, date, timedelta
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
-from email.mime.base import MIMEBase
-from email import encoders
+from email.mime.application import MIMEApplication
 from io import BytesIO
 
 import psycopg2
+import psycopg2.pool
 from reportlab.lib import colors
 from reportlab.lib.pagesizes import A4
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
@@ -108,6 +109,10 @@ ITEM_NAMES = {
     'cotton_blanket': '솜 이불',
 }
 
+# 거래명세서 PDF를 프로세스 풀로 병렬 생성할 최소 사업자 수
+# PDF 1건 약 0.1s, 풀 기동/피클링 0.1~0.4s(fork/spawn)라 사업자 3~4곳인 현재는 순차 생성이 빠름
+PDF_POOL_MIN_BUSINESSES = 8
+
 # ============================================================
 # Google Sheets 연동 설정
 # ============================================================
@@ -450,14 +455,28 @@ def calculate_business_total(data: dict) -> int:
     return total
 
 
+def calculate_business_totals(data: dict) -> tuple[int, int, int]:
+    """사업자 1곳의 (공급가액, 세액, 합계) 계산"""
+    total = calculate_business_total(data)
+    supply_amount, tax_amount = split_vat_inclusive_amount(total)
+    return supply_amount, tax_amount, total
+
+
+def get_business_totals(data: dict) -> tuple[int, int, int]:
+    """집계 시 저장해 둔 (공급가액, 세액, 합계) 반환, 없으면 계산"""
+    if 'totals' in data:
+        return data['totals']
+    return calculate_business_totals(data)
+
+
 def calculate_total_amount_from_business_data(business_data: dict) -> int:
     """사업자별 집계에서 전체 정산 총액 계산"""
-    return sum(calculate_business_total(data) for data in business_data.values())
+    return sum(get_business_totals(data)[2] for data in business_data.values())
 
 
 def calculate_kops_receivable_amount(business_data: dict) -> int:
     """콥스 익월 입금 대상 정산액 계산"""
-    return calculate_business_total(business_data.get(KOPS_REG_NO, {}))
+    return get_business_totals(business_data.get(KOPS_REG_NO, {}))[2]
 
 
 def format_won(amount: int) -> str:
@@ -774,39 +793,92 @@ def calculate_record_amount(row: tuple) -> int:
 # 데이터 조회
 # ============================================================
 
+_DB_POOL = None
+
+
+def _get_db_pool() -> psycopg2.pool.SimpleConnectionPool:
+    """Supabase 연결 풀 (첫 조회 시 생성, 실행 동안 연결 재사용)"""
+    global _DB_POOL
+    if _DB_POOL is None:
+        _DB_POOL = psycopg2.pool.SimpleConnectionPool(1, 2, SUPABASE_URI)
+    return _DB_POOL
+
+
+def _close_db_pool():
+    """Supabase 연결 풀의 연결을 모두 닫음 (실행 종료 시)"""
+    global _DB_POOL
+    if _DB_POOL is not None:
+        _DB_POOL.closeall()
+        _DB_POOL = None
+
+
 def get_monthly_data(year: int, month: int) -> list:
-    """해당 월의 세탁물 데이터 조회"""
+    """해당 월의 세탁물 데이터 조회 (일자×숙소 단위로 DB에서 합산)"""
     start_date, end_exclusive = get_settlement_period(year, month)
-    conn = psycopg2.connect(SUPABASE_URI)
-    cur = conn.cursor()
-
-    cur.execute("""
-        SELECT record_date, location, blanket, mat, pillow_cover, towel, body_towel, pillow_fill, cotton_blanket
-        FROM laundry_records
-        WHERE record_date >= %s
-          AND record_date < %s
-        ORDER BY location, record_date
-    """, (start_date, end_exclusive))
+    pool = _get_db_pool()
+    conn = pool.getconn()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT record_date,
+                   location,
+                   COALESCE(SUM(blanket),0)        AS blanket,
+                   COALESCE(SUM(mat),0)            AS mat,
+                   COALESCE(SUM(pillow_cover),0)   AS pillow_cover,
+                   COALESCE(SUM(towel),0)          AS towel,
+                   COALESCE(SUM(body_towel),0)     AS body_towel,
+                   COALESCE(SUM(pillow_fill),0)    AS pillow_fill,
+                   COALESCE(SUM(cotton_blanket),0) AS cotton_blanket
+            FROM laundry_records
+            WHERE record_date >= %s
+              AND record_date < %s
+            GROUP BY location, record_date
+            ORDER BY location, record_date
+        """, (start_date, end_exclusive))
 
-    rows = cur.fetchall()
-    cur.close()
-    conn.close()
+        # 일자×숙소 합계라 월 최대 수백 건. 레포트/시트 업데이트에서 재사용하므로 한 번에 가져옴
+        rows = cur.fetchall()
+        cur.close()
+    finally:
+        pool.putconn(conn)
 
     return rows
 
 
-def aggregate_by_business(rows: list) -> dict:
-    """사업자별로 데이터 집계"""
-    business_data = {}
+def sum_quantities_by_location(rows: list) -> dict:
+    """정산 대상 기록을 숙소별 품목 수량 합계로 1회 순회 집계"""
+    location_totals = {}
 
     for row in rows:
         record_date, location, blanket, mat, pillow_cover, towel, body_towel, pillow_fill, cotton_blanket = row
 
+        if not is_settlement_location_active(location, record_date):
+            continue
+
+        loc_data = location_totals.get(location)
+        if loc_data is None:
+            loc_data = location_totals[location] = {item_key: 0 for item_key in ITEM_NAMES}
+
+        # 수량은 get_monthly_data의 COALESCE(SUM(...), 0)로 NULL 없이 들어옴
+        loc_data['blanket'] += blanket
+        loc_data['mat'] += mat
+        loc_data['pillow_cover'] += pillow_cover
+        loc_data['towel'] += towel
+        loc_data['body_towel'] += body_towel
+        loc_data['pillow_fill'] += pillow_fill
+        loc_data['cotton_blanket'] += cotton_blanket
+
+    return location_totals
+
+
+def aggregate_by_business(rows: list) -> dict:
+    """사업자별로 데이터 집계 (숙소별 합계를 사업자에 배분)"""
+    business_data = {}
+
+    for location, loc_data in sum_quantities_by_location(rows).items():
         if location not in BUSINESS_MAP:
             print(f"알 수 없는 숙소: {location}")
             continue
-        if not is_settlement_location_active(location, record_date):
-            continue
 
         reg_no, biz_name, owner = BUSINESS_MAP[location]
 
@@ -814,24 +886,15 @@ def aggregate_by_business(rows: list) -> dict:
             business_data[reg_no] = {
                 'name': biz_name,
                 'owner': owner,
+                'reg_no_digits': reg_no.replace('-', ''),
                 'locations': {},
                 'extra_items': []
             }
 
-        if location not in business_data[reg_no]['locations']:
-            business_data[reg_no]['locations'][location] = {
-                'blanket': 0, 'mat': 0, 'pillow_cover': 0,
-                'towel': 0, 'body_towel': 0, 'pillow_fill': 0, 'cotton_blanket': 0
-            }
+        business_data[reg_no]['locations'][location] = loc_data
 
-        loc_data = business_data[reg_no]['locations'][location]
-        loc_data['blanket'] += blanket or 0
-        loc_data['mat'] += mat or 0
-        loc_data['pillow_cover'] += pillow_cover or 0
-        loc_data['towel'] += towel or 0
-        loc_data['body_towel'] += body_towel or 0
-        loc_data['pillow_fill'] += pillow_fill or 0
-        loc_data['cotton_blanket'] += cotton_blanket or 0
+    for data in business_data.values():
+        data['totals'] = calculate_business_totals(data)
 
     return business_data
 
@@ -861,6 +924,104 @@ def register_font():
     return False
 
 
+# 거래명세서 표 스타일 (폰트는 _get_pdf_styles에서 지정)
+_INFO_TABLE_STYLE = TableStyle([
+    ('FONTSIZE', (0,0), (-1,-1), 9),
+    ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+    ('BACKGROUND', (0,0), (0,-1), colors.HexColor('#f0f0f0')),
+    ('BACKGROUND', (2,0), (2,-1), colors.HexColor('#f0f0f0')),
+    ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+    ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+    ('TOPPADDING', (0,0), (-1,-1), 4),
+    ('BOTTOMPADDING', (0,0), (-1,-1), 4),
+])
+
+_ITEM_TABLE_STYLE = TableStyle([
+    ('FONTSIZE', (0,0), (-1,-1), 9),
+    ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+    ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#3b82f6')),
+    ('TEXTCOLOR', (0,0), (-1,0), colors.white),
+    ('BACKGROUND', (0,-1), (-1,-1), colors.HexColor('#eff6ff')),
+    ('ALIGN', (1,0), (-1,-1), 'RIGHT'),
+    ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+    ('TOPPADDING', (0,0), (-1,-1), 4),
+    ('BOTTOMPADDING', (0,0), (-1,-1), 4),
+])
+
+_EXTRA_TABLE_STYLE = TableStyle([
+    ('FONTSIZE', (0,0), (-1,-1), 9),
+    ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+    ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#f97316')),
+    ('TEXTCOLOR', (0,0), (-1,0), colors.white),
+    ('ALIGN', (1,0), (-1,-1), 'RIGHT'),
+])
+
+_TOTAL_TABLE_STYLE = TableStyle([
+    ('FONTSIZE', (0,0), (-1,-1), 11),
+    ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+    ('BACKGROUND', (0,0), (0,-1), colors.HexColor('#f0f0f0')),
+    ('BACKGROUND', (0,-1), (-1,-1), colors.HexColor('#1e40af')),
+    ('TEXTCOLOR', (0,-1), (-1,-1), colors.white),
+    ('ALIGN', (1,0), (1,-1), 'RIGHT'),
+    ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+    ('TOPPADDING', (0,0), (-1,-1), 6),
+    ('BOTTOMPADDING', (0,0), (-1,-1), 6),
+])
+
+_FONT_NAME = None
+_PDF_STYLES = {}
+_PRICE_LABELS = {}
+
+
+def _get_font_name() -> str:
+    """한글 폰트 등록 결과를 프로세스당 1회만 계산해 재사용"""
+    global _FONT_NAME
+    if _FONT_NAME is None:
+        # fork로 생성된 워커는 부모에서 파싱한 폰트를 그대로 물려받음
+        if 'Korean' in pdfmetrics.getRegisteredFontNames():
+            _FONT_NAME = 'Korean'
+        else:
+            _FONT_NAME = 'Korean' if register_font() else 'Helvetica'
+    return _FONT_NAME
+
+
+def _get_price_labels(location: str) -> dict:
+    """숙소별 단가 표시 문자열 (숙소당 1회 포맷 후 재사용)"""
+    if location not in _PRICE_LABELS:
+        _PRICE_LABELS[location] = {
+            item_key: format_won(price)
+            for item_key, price in get_location_prices(location).items()
+        }
+    return _PRICE_LABELS[location]
+
+
+def _with_font(base_style: TableStyle, font_name: str) -> TableStyle:
+    """공통 표 스타일에 폰트만 덧붙인 TableStyle 반환"""
+    return TableStyle([('FONTNAME', (0,0), (-1,-1), font_name)], parent=base_style)
+
+
+def _get_pdf_styles(font_name: str) -> dict:
+    """거래명세서 문단/표 스타일 (폰트별로 1회 생성 후 재사용)"""
+    if font_name in _PDF_STYLES:
+        return _PDF_STYLES[font_name]
+
+    styles = getSampleStyleSheet()
+    _PDF_STYLES[font_name] = {
+        'title': ParagraphStyle('Title', parent=styles['Title'],
+                                fontName=font_name, fontSize=18, alignment=1),
+        'normal': ParagraphStyle('Normal', parent=styles['Normal'],
+                                 fontName=font_name, fontSize=10),
+        'heading': ParagraphStyle('Heading', parent=styles['Normal'],
+                                  fontName=font_name, fontSize=12,
+                                  textColor=colors.HexColor('#1e40af')),
+        'info_table': _with_font(_INFO_TABLE_STYLE, font_name),
+        'item_table': _with_font(_ITEM_TABLE_STYLE, font_name),
+        'extra_table': _with_font(_EXTRA_TABLE_STYLE, font_name),
+        'total_table': _with_font(_TOTAL_TABLE_STYLE, font_name),
+    }
+    return _PDF_STYLES[font_name]
+
+
 def generate_pdf(reg_no: str, data: dict, year: int, month: int) -> BytesIO:
     """거래명세서 PDF 생성"""
     buffer = BytesIO()
@@ -868,18 +1029,11 @@ def generate_pdf(reg_no: str, data: dict, year: int, month: int) -> BytesIO:
                            leftMargin=15*mm, rightMargin=15*mm,
                            topMargin=15*mm, bottomMargin=15*mm)
 
-    # 폰트 등록
-    font_registered = register_font()
-    font_name = 'Korean' if font_registered else 'Helvetica'
-
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle('Title', parent=styles['Title'],
-                                  fontName=font_name, fontSize=18, alignment=1)
-    normal_style = ParagraphStyle('Normal', parent=styles['Normal'],
-                                   fontName=font_name, fontSize=10)
-    heading_style = ParagraphStyle('Heading', parent=styles['Normal'],
-                                    fontName=font_name, fontSize=12,
-                                    textColor=colors.HexColor('#1e40af'))
+    # 폰트/스타일 (프로세스 단위 캐시)
+    pdf_styles = _get_pdf_styles(_get_font_name())
+    title_style = pdf_styles['title']
+    normal_style = pdf_styles['normal']
+    heading_style = pdf_styles['heading']
 
     elements = []
 
@@ -896,23 +1050,11 @@ def generate_pdf(reg_no: str, data: dict, year: int, month: int) -> BytesIO:
     ]
 
     info_table = Table(info_data, colWidths=[25*mm, 55*mm, 25*mm, 55*mm])
-    info_table.setStyle(TableStyle([
-        ('FONTNAME', (0,0), (-1,-1), font_name),
-        ('FONTSIZE', (0,0), (-1,-1), 9),
-        ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-        ('BACKGROUND', (0,0), (0,-1), colors.HexColor('#f0f0f0')),
-        ('BACKGROUND', (2,0), (2,-1), colors.HexColor('#f0f0f0')),
-        ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('TOPPADDING', (0,0), (-1,-1), 4),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 4),
-    ]))
+    info_table.setStyle(pdf_styles['info_table'])
     elements.append(info_table)
     elements.append(Spacer(1, 8*mm))
 
     # 숙소별 내역
-    grand_total = 0
-
     for idx, (location, loc_data) in enumerate(data['locations'].items(), 1):
         elements.append(Paragraph(f"[{idx}] {location}", heading_style))
         elements.append(Spacer(1, 3*mm))
@@ -922,30 +1064,18 @@ def generate_pdf(reg_no: str, data: dict, year: int, month: int) -> BytesIO:
         loc_total = 0
 
         prices = get_location_prices(location)
+        price_labels = _get_price_labels(location)
         for item_key, item_name in ITEM_NAMES.items():
             qty = loc_data.get(item_key, 0)
             if qty > 0:
-                price = prices[item_key]
-                amount = qty * price
+                amount = qty * prices[item_key]
                 loc_total += amount
-                item_rows.append([item_name, f"{qty:,}", f"{price:,}원", f"{amount:,}원"])
+                item_rows.append([item_name, f"{qty:,}", price_labels[item_key], f"{amount:,}원"])
 
         item_rows.append(['소계', '', '', f"{loc_total:,}원"])
-        grand_total += loc_total
 
         item_table = Table(item_rows, colWidths=[50*mm, 30*mm, 35*mm, 45*mm])
-        item_table.setStyle(TableStyle([
-            ('FONTNAME', (0,0), (-1,-1), font_name),
-            ('FONTSIZE', (0,0), (-1,-1), 9),
-            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-            ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#3b82f6')),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-            ('BACKGROUND', (0,-1), (-1,-1), colors.HexColor('#eff6ff')),
-            ('ALIGN', (1,0), (-1,-1), 'RIGHT'),
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-            ('TOPPADDING', (0,0), (-1,-1), 4),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 4),
-        ]))
+        item_table.setStyle(pdf_styles['item_table'])
         elements.append(item_table)
         elements.append(Spacer(1, 5*mm))
 
@@ -956,7 +1086,6 @@ def generate_pdf(reg_no: str, data: dict, year: int, month: int) -> BytesIO:
 
         extra_rows = [['항목', '수량', '단가', '금액']]
         for item in data['extra_items']:
-            grand_total += item['amount']
             extra_rows.append([
                 item['name'],
                 f"{item['qty']:,}",
@@ -965,19 +1094,12 @@ def generate_pdf(reg_no: str, data: dict, year: int, month: int) -> BytesIO:
             ])
 
         extra_table = Table(extra_rows, colWidths=[50*mm, 30*mm, 35*mm, 45*mm])
-        extra_table.setStyle(TableStyle([
-            ('FONTNAME', (0,0), (-1,-1), font_name),
-            ('FONTSIZE', (0,0), (-1,-1), 9),
-            ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-            ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#f97316')),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.white),
-            ('ALIGN', (1,0), (-1,-1), 'RIGHT'),
-        ]))
+        extra_table.setStyle(pdf_styles['extra_table'])
         elements.append(extra_table)
         elements.append(Spacer(1, 5*mm))
 
     # 합계
-    supply_amount, tax_amount = split_vat_inclusive_amount(grand_total)
+    supply_amount, tax_amount, grand_total = get_business_totals(data)
 
     total_data = [
         ['공급가액', f"{supply_amount:,}원"],
@@ -986,18 +1108,7 @@ def generate_pdf(reg_no: str, data: dict, year: int, month: int) -> BytesIO:
     ]
 
     total_table = Table(total_data, colWidths=[50*mm, 110*mm])
-    total_table.setStyle(TableStyle([
-        ('FONTNAME', (0,0), (-1,-1), font_name),
-        ('FONTSIZE', (0,0), (-1,-1), 11),
-        ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
-        ('BACKGROUND', (0,0), (0,-1), colors.HexColor('#f0f0f0')),
-        ('BACKGROUND', (0,-1), (-1,-1), colors.HexColor('#1e40af')),
-        ('TEXTCOLOR', (0,-1), (-1,-1), colors.white),
-        ('ALIGN', (1,0), (1,-1), 'RIGHT'),
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('TOPPADDING', (0,0), (-1,-1), 6),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 6),
-    ]))
+    total_table.setStyle(pdf_styles['total_table'])
     elements.append(total_table)
     elements.append(Spacer(1, 8*mm))
 
@@ -1023,15 +1134,21 @@ def generate_pdf(reg_no: str, data: dict, year: int, month: int) -> BytesIO:
     return buffer
 
 
+def _render_pdf(task: tuple) -> tuple[str, bytes]:
+    """프로세스 풀 작업 단위: 사업자 1곳의 거래명세서 PDF 렌더링"""
+    reg_no, data, year, month = task
+    filename = f"{year}년 {month}월 거래명세서 ({data['name']}).pdf"
+    return filename, generate_pdf(reg_no, data, year, month).getvalue()
+
+
 # ============================================================
 # Excel 생성
 # ============================================================
 
 def generate_excel(business_data: dict, year: int, month: int) -> BytesIO:
     """홈택스 세금계산서 Excel 생성"""
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "세금계산서"
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("세금계산서")
 
     # 헤더
     headers = ['작성일자', '공급받는자 사업자번호', '공급받는자 상호',
@@ -1043,14 +1160,11 @@ def generate_excel(business_data: dict, year: int, month: int) -> BytesIO:
     write_date = f"{year}{month:02d}{last_day:02d}"
 
     for reg_no, data in business_data.items():
-        # 총액 계산
-        total = calculate_business_total(data)
-
-        supply_amount, tax_amount = split_vat_inclusive_amount(total)
+        supply_amount, tax_amount, total = get_business_totals(data)
 
         ws.append([
             write_date,
-            reg_no.replace('-', ''),
+            data.get('reg_no_digits') or reg_no.replace('-', ''),
             data['name'],
             data['owner'],
             supply_amount,
@@ -1065,16 +1179,88 @@ def generate_excel(business_data: dict, year: int, month: int) -> BytesIO:
     return buffer
 
 
+def _render_excel(business_data: dict, year: int, month: int) -> tuple[str, bytes]:
+    """프로세스 풀 작업 단위: 홈택스 세금계산서 Excel 렌더링"""
+    filename = f"{year}년 {month}월 세금계산서 (홈택스).xlsx"
+    return filename, generate_excel(business_data, year, month).getvalue()
+
+
+def generate_attachments(business_data: dict, year: int, month: int) -> list:
+    """거래명세서 PDF와 세금계산서 Excel 생성 (사업자가 많으면 프로세스 풀에서 동시 생성)"""
+    tasks = [(reg_no, data, year, month) for reg_no, data in business_data.items()]
+    _get_font_name()  # 워커 생성 전에 부모에서 폰트를 1회 파싱
+
+    # 사업자가 적으면 워커 기동/피클링 비용이 렌더링보다 커서 현재 프로세스에서 생성
+    if len(tasks) < PDF_POOL_MIN_BUSINESSES:
+        rendered = [_render_pdf(task) for task in tasks]
+        rendered.append(_render_excel(business_data, year, month))
+        return [(filename, BytesIO(content)) for filename, content in rendered]
+
+    max_workers = min(os.cpu_count() or 1, len(tasks) + 1)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=_get_font_name) as executor:
+        excel_future = executor.submit(_render_excel, business_data, year, month)
+        rendered = list(executor.map(_render_pdf, tasks))
+        rendered.append(excel_future.result())
+    return [(filename, BytesIO(content)) for filename, content in rendered]
+
+
 # ============================================================
 # 이메일 발송
 # ============================================================
 
-def send_email(subject: str, body: str, attachments: list):
-    """이메일 발송"""
+def get_recipients() -> list:
+    """정산 메일 수신자 목록"""
+    return [EMAIL_TO] + ([EMAIL_CC] if EMAIL_CC else [])
+
+
+def _open_smtp() -> smtplib.SMTP_SSL:
+    """인증까지 마친 Gmail SMTP 세션 반환"""
+    server = smtplib.SMTP_SSL('smtp.gmail.com', 465)
+    try:
+        server.login(EMAIL_FROM, EMAIL_PASSWORD)
+    except Exception:
+        server.close()
+        raise
+    return server
+
+
+def send_emails(messages: list) -> bool:
+    """여러 이메일을 SMTP 세션 1개로 발송"""
     if not EMAIL_PASSWORD:
         print("EMAIL_PASSWORD가 설정되지 않음. 이메일 발송 건너뜀.")
         return False
 
+    all_sent = True
+    server = None
+    try:
+        for msg in messages:
+            # 메일별로 실패를 분리: 앞 메일이 실패해도 나머지는 발송 시도
+            try:
+                if server is None:
+                    server = _open_smtp()
+                refused = server.send_message(msg)
+                if refused:
+                    print(f"이메일 일부 수신 거부 ({msg['Subject']}): {refused}")
+                else:
+                    print(f"이메일 발송 완료 ({msg['Subject']}) → {', '.join(get_recipients())}")
+            except Exception as e:
+                print(f"이메일 발송 실패 ({msg['Subject']}): {e}")
+                all_sent = False
+                # 세션 상태를 알 수 없으므로 다음 메일은 새 세션으로 발송
+                if server is not None:
+                    server.close()
+                    server = None
+    finally:
+        if server is not None:
+            try:
+                server.quit()
+            except Exception:
+                server.close()
+    return all_sent
+
+
+def build_email(subject: str, body: str, attachments: list) -> MIMEMultipart:
+    """첨부파일 포함 정산 이메일 메시지 생성"""
     msg = MIMEMultipart()
     msg['From'] = EMAIL_FROM
     msg['To'] = EMAIL_TO
@@ -1085,27 +1271,16 @@ def send_email(subject: str, body: str, attachments: list):
     msg.attach(MIMEText(body, 'plain', 'utf-8'))
 
     for filename, data in attachments:
-        part = MIMEBase('application', 'octet-stream')
-        part.set_payload(data.read())
-        encoders.encode_base64(part)
+        part = MIMEApplication(data.getvalue())
         part.add_header('Content-Disposition', 'attachment', filename=filename)
         msg.attach(part)
 
-    recipients = [EMAIL_TO] + ([EMAIL_CC] if EMAIL_CC else [])
-    try:
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(EMAIL_FROM, EMAIL_PASSWORD)
-        refused = server.sendmail(EMAIL_FROM, recipients, msg.as_string())
-        server.quit()
-        if refused:
-            print(f"이메일 일부 수신 거부: {refused}")
-        else:
-            print(f"이메일 발송 완료 → {', '.join(recipients)}")
-        return True
-    except Exception as e:
-        print(f"이메일 발송 실패: {e}")
-        return False
+    return msg
+
+
+def send_email(subject: str, body: str, attachments: list):
+    """이메일 발송"""
+    return send_emails([build_email(subject, body, attachments)])
 
 
 def _get_6month_trend(year: int, month: int) -> list:
@@ -1122,30 +1297,33 @@ def _get_6month_trend(year: int, month: int) -> list:
     months.reverse()  # 오래된 순서로
 
     try:
-        conn = psycopg2.connect(SUPABASE_URI)
-        cur = conn.cursor()
-        start_y, start_m = months[0]
-        start_date, _ = get_settlement_period(start_y, start_m)
-        _, end_exclusive = get_settlement_period(year, month)
-        cur.execute("""
-            SELECT record_date,
-                   location,
-                   COALESCE(SUM(blanket),0)      AS blanket,
-                   COALESCE(SUM(mat),0)          AS mat,
-                   COALESCE(SUM(pillow_cover),0) AS pillow_cover,
-                   COALESCE(SUM(towel),0)        AS towel,
-                   COALESCE(SUM(body_towel),0)   AS body_towel,
-                   COALESCE(SUM(pillow_fill),0)  AS pillow_fill,
-                   COALESCE(SUM(cotton_blanket),0) AS cotton_blanket
-            FROM laundry_records
-            WHERE record_date >= %s
-              AND record_date < %s
-            GROUP BY record_date, location
-            ORDER BY record_date
-        """, (start_date, end_exclusive))
-        loc_rows = cur.fetchall()
-        cur.close()
-        conn.close()
+        pool = _get_db_pool()
+        conn = pool.getconn()
+        try:
+            cur = conn.cursor()
+            start_y, start_m = months[0]
+            start_date, _ = get_settlement_period(start_y, start_m)
+            _, end_exclusive = get_settlement_period(year, month)
+            cur.execute("""
+                SELECT record_date,
+                       location,
+                       COALESCE(SUM(blanket),0)      AS blanket,
+                       COALESCE(SUM(mat),0)          AS mat,
+                       COALESCE(SUM(pillow_cover),0) AS pillow_cover,
+                       COALESCE(SUM(towel),0)        AS towel,
+                       COALESCE(SUM(body_towel),0)   AS body_towel,
+                       COALESCE(SUM(pillow_fill),0)  AS pillow_fill,
+                       COALESCE(SUM(cotton_blanket),0) AS cotton_blanket
+                FROM laundry_records
+                WHERE record_date >= %s
+                  AND record_date < %s
+                GROUP BY record_date, location
+                ORDER BY record_date
+            """, (start_date, end_exclusive))
+            loc_rows = cur.fetchall()
+            cur.close()
+        finally:
+            pool.putconn(conn)
     except Exception as e:
         print(f"6개월 추이 조회 실패: {e}")
         return [(y, m, 0) for y, m in months]
@@ -1166,12 +1344,8 @@ def _get_6month_trend(year: int, month: int) -> list:
     return [(y, m, monthly[(y, m)]) for y, m in months]
 
 
-def send_report_email(year: int, month: int, rows: list, business_data: dict) -> bool:
-    """내부 검토용 정산 레포트 이메일 발송 (HTML 테이블)"""
-    if not EMAIL_PASSWORD:
-        print("EMAIL_PASSWORD 미설정. 레포트 이메일 건너뜀.")
-        return False
-
+def build_report_email(year: int, month: int, rows: list, business_data: dict) -> MIMEMultipart:
+    """내부 검토용 정산 레포트 이메일 메시지 생성 (HTML 테이블)"""
     from collections import defaultdict
 
     weekday_ko = ['월', '화', '수', '목', '금', '토', '일']
@@ -1357,7 +1531,7 @@ def send_report_email(year: int, month: int, rows: list, business_data: dict) ->
 <html><head><meta charset="utf-8"></head>
 <body style="font-family:'Apple SD Gothic Neo',Arial,sans-serif;max-width:720px;margin:0 auto;padding:20px;color:#111827;">
   <h2 style="margin:0 0 4px;font-size:20px;color:#111827;">[캐리] {year}년 {month}월 정산 내부 레포트</h2>
-  <p style="margin:0 0 20px;font-size:13px;color:#6b7280;">정산 기간 {format_settlement_period(year, month)} · 레코드 {len(rows)}건 · 사업자 {len(business_data)}개</p>
+  <p style="margin:0 0 20px;font-size:13px;color:#6b7280;">정산 기간 {format_settlement_period(year, month)} · 일자×숙소 {len(rows)}건 · 사업자 {len(business_data)}개</p>
   {trend_html}
   {profit_summary_html}
   {monthly_close_html}
@@ -1368,27 +1542,19 @@ def send_report_email(year: int, month: int, rows: list, business_data: dict) ->
   </div>
 </body></html>"""
 
-    subject = f"[캐리 레포트] {year}년 {month}월 정산 검토"
-    try:
-        msg = MIMEMultipart('alternative')
-        recipients = [EMAIL_TO] + ([EMAIL_CC] if EMAIL_CC else [])
-        msg['From'] = EMAIL_FROM
-        msg['To'] = EMAIL_TO
-        if EMAIL_CC:
-            msg['Cc'] = EMAIL_CC
-        msg['Subject'] = subject
-        msg.attach(MIMEText(html, 'html', 'utf-8'))
-        with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
-            server.login(EMAIL_FROM, EMAIL_PASSWORD)
-            refused = server.sendmail(EMAIL_FROM, recipients, msg.as_string())
-        if refused:
-            print(f"레포트 이메일 일부 수신 거부: {refused}")
-        else:
-            print(f"레포트 이메일 발송 완료 → {', '.join(recipients)}")
-        return True
-    except Exception as e:
-        print(f"레포트 이메일 발송 실패: {e}")
-        return False
+    msg = MIMEMultipart('alternative')
+    msg['From'] = EMAIL_FROM
+    msg['To'] = EMAIL_TO
+    if EMAIL_CC:
+        msg['Cc'] = EMAIL_CC
+    msg['Subject'] = f"[캐리 레포트] {year}년 {month}월 정산 검토"
+    msg.attach(MIMEText(html, 'html', 'utf-8'))
+    return msg
+
+
+def send_report_email(year: int, month: int, rows: list, business_data: dict) -> bool:
+    """내부 검토용 정산 레포트 이메일 발송"""
+    return send_emails([build_report_email(year, month, rows, business_data)])
 
 
 # ============================================================
@@ -1790,24 +1956,7 @@ def update_invoice_sheets(year: int, month: int, rows: list) -> bool:
         print("Sheets 토큰 없음. 거래명세서 시트 업데이트 건너뜀.")
         return False
 
-    location_totals = {}
-    for row in rows:
-        record_date, location, blanket, mat, pillow_cover, towel, body_towel, pillow_fill, cotton_blanket = row
-        if not is_settlement_location_active(location, record_date):
-            continue
-        if location not in location_totals:
-            location_totals[location] = {item_key: 0 for item_key in ITEM_NAMES}
-        item_values = {
-            'blanket': blanket,
-            'mat': mat,
-            'pillow_cover': pillow_cover,
-            'towel': towel,
-            'body_towel': body_towel,
-            'pillow_fill': pillow_fill,
-            'cotton_blanket': cotton_blanket,
-        }
-        for item_key, value in item_values.items():
-            location_totals[location][item_key] += value or 0
+    location_totals = sum_quantities_by_location(rows)
 
     month_str = f'{year}년 {month}월'
     try:
@@ -1862,7 +2011,8 @@ def get_invoice_job_mode() -> str:
     return job_mode
 
 
-def main():
+def run_invoice_job():
+    """정산 배치 본체 (대상 월 결정 → 조회 → 첨부 생성 → 발송 → 시트 업데이트)"""
     # 대상 월 결정 (실행일이 말일이면 해당 월, 아니면 전월)
     today = date.today()
     last_day = calendar.monthrange(today.year, today.month)[1]
@@ -1902,7 +2052,7 @@ def main():
         print("데이터 없음")
         return
 
-    print(f"조회된 레코드: {len(rows)}건")
+    print(f"조회된 일자×숙소 집계: {len(rows)}건")
 
     # 사업자별 집계
     business_data = aggregate_by_business(rows)
@@ -1913,20 +2063,10 @@ def main():
             sys.exit(1)
         return
 
-    # PDF 생성
-    attachments = []
-
-    for reg_no, data in business_data.items():
-        pdf_buffer = generate_pdf(reg_no, data, year, month)
-        filename = f"{year}년 {month}월 거래명세서 ({data['name']}).pdf"
-        attachments.append((filename, pdf_buffer))
-        print(f"PDF 생성: {filename}")
-
-    # Excel 생성
-    excel_buffer = generate_excel(business_data, year, month)
-    excel_filename = f"{year}년 {month}월 세금계산서 (홈택스).xlsx"
-    attachments.append((excel_filename, excel_buffer))
-    print(f"Excel 생성: {excel_filename}")
+    # PDF/Excel 생성
+    attachments = generate_attachments(business_data, year, month)
+    for filename, _ in attachments:
+        print(f"첨부 생성: {filename}")
 
     # 합계 계산
     total_amount = calculate_total_amount_from_business_data(business_data)
@@ -1954,12 +2094,11 @@ def main():
 감사합니다.
 """
 
-    # 버퍼 위치 리셋
-    for filename, buffer in attachments:
-        buffer.seek(0)
-
-    send_report_email(year, month, rows, business_data)
-    send_email(subject, body, attachments)
+    # 레포트/거래명세서 메일을 SMTP 세션 1개로 발송
+    send_emails([
+        build_report_email(year, month, rows, business_data),
+        build_email(subject, body, attachments),
+    ])
 
     # Google Sheets 업데이트
     update_profit_sheet(year, month, total_amount)
@@ -1980,5 +2119,13 @@ def main():
         print(f"로컬 저장: {output_dir}")
 
 
+
+def main():
+    try:
+        run_invoice_job()
+    finally:
+        _close_db_pool()
+
+
 if __name__ == '__main__':
     main()
@@ -2,6 +2,7 @@ import importlib.util
 import os
 from pathlib import Path
 import sys
+from types import SimpleNamespace
 import unittest
 from unittest.mock import patch
 
@@ -246,6 +247,76 @@ class ProfitSummaryTests(unittest.TestCase):
         self.assertAlmostEqual(values_by_range["영업이익계산!R7"], 0.2198, places=4)
         self.assertEqual(captured["formatted_row"], 7)
 
+    def test_aggregate_by_business_stores_vat_split_totals(self):
+        rows = [
+            (self.gi.date(2026, 6, 1), "중구 장충단로 225", 7, 3, 12, 18, 4, 0, 0),
+            (self.gi.date(2026, 6, 2), "서대문구 연희로4길 25-7", 10, 5, 20, 30, 0, 0, 0),
+        ]
+
+        business_data = self.gi.aggregate_by_business(rows)
+
+        self.assertEqual(business_data["554-88-03481"]["totals"], (39_454, 3_946, 43_400))
+        self.assertEqual(business_data["554-88-03481"]["reg_no_digits"], "5548803481")
+        self.assertEqual(business_data[self.gi.KOPS_REG_NO]["totals"], (54_545, 5_455, 60_000))
+        self.assertEqual(self.gi.calculate_total_amount_from_business_data(business_data), 103_400)
+
+    def test_aggregate_by_business_sums_each_location_once_and_skips_unknown(self):
+        rows = [
+            (self.gi.date(2026, 5, 29), "동대문구 장한로26나길 21", 1, 1, 1, 1, 0, 0, 0),
+            (self.gi.date(2026, 6, 1), "동대문구 장한로26나길 21", 9, 9, 9, 9, 0, 0, 0),
+            (self.gi.date(2026, 6, 1), "서대문구 연희로4길 25-7", 2, 0, 4, 6, 0, 0, 0),
+            (self.gi.date(2026, 6, 4), "서대문구 연희로4길 25-7", 3, 1, 0, 2, 0, 0, 1),
+            (self.gi.date(2026, 6, 4), "미등록 숙소", 5, 5, 5, 5, 5, 5, 5),
+        ]
+
+        business_data = self.gi.aggregate_by_business(rows)
+        locations = business_data[self.gi.KOPS_REG_NO]["locations"]
+
+        self.assertEqual(list(business_data), [self.gi.KOPS_REG_NO])
+        self.assertEqual(locations["동대문구 장한로26나길 21"]["blanket"], 1)
+        self.assertEqual(locations["서대문구 연희로4길 25-7"], {
+            "blanket": 5,
+            "mat": 1,
+            "pillow_cover": 4,
+            "towel": 8,
+            "body_towel": 0,
+            "pillow_fill": 0,
+            "cotton_blanket": 1,
+        })
+
+    def test_generate_excel_writes_hometax_rows(self):
+        from openpyxl import load_workbook
+
+        rows = [(self.gi.date(2026, 6, 1), "중구 장충단로 225", 7, 3, 12, 18, 4, 0, 0)]
+        business_data = self.gi.aggregate_by_business(rows)
+
+        workbook = load_workbook(self.gi.generate_excel(business_data, 2026, 6))
+        sheet = workbook["세금계산서"]
+
+        self.assertEqual(workbook.sheetnames, ["세금계산서"])
+        self.assertEqual(sheet["A1"].value, "작성일자")
+        self.assertEqual(
+            [cell.value for cell in sheet[2]],
+            ["20260630", "5548803481", "주식회사 모어브릿지", "홍석화", 39_454, 3_946, 43_400, "세탁 서비스"],
+        )
+
+    def test_generate_excel_accepts_business_data_built_without_aggregation(self):
+        from openpyxl import load_workbook
+
+        business_data = {
+            "554-88-03481": {
+                "name": "주식회사 모어브릿지",
+                "owner": "홍석화",
+                "locations": {"중구 장충단로 225": {"blanket": 10}},
+                "extra_items": [],
+            },
+        }
+
+        sheet = load_workbook(self.gi.generate_excel(business_data, 2026, 6))["세금계산서"]
+
+        self.assertEqual(sheet["B2"].value, "5548803481")
+        self.assertEqual(sheet["G2"].value, 30_000)
+
     def test_gangnam_location_uses_kops_business_and_default_prices(self):
         reg_no, name, owner = self.gi.BUSINESS_MAP["강남구 봉은사로37길 8"]
 
@@ -303,6 +374,7 @@ class ProfitSummaryTests(unittest.TestCase):
         self.gi.generate_excel = fail_if_called
         self.gi.send_report_email = fail_if_called
         self.gi.send_email = fail_if_called
+        self.gi.send_emails = fail_if_called
         self.gi.update_profit_sheet = fail_if_called
 
         with patch.dict(os.environ, {"INVOICE_JOB_MODE": "invoice_sheets_only"}), \
@@ -311,6 +383,21 @@ class ProfitSummaryTests(unittest.TestCase):
 
         self.assertEqual(calls["invoice_sheets"], (2026, 6, rows))
 
+    def test_main_closes_db_pool_even_when_job_exits(self):
+        closed = []
+        self.gi._DB_POOL = SimpleNamespace(closeall=lambda: closed.append(True))
+
+        def exit_job():
+            raise SystemExit(1)
+
+        self.gi.run_invoice_job = exit_job
+
+        with self.assertRaises(SystemExit):
+            self.gi.main()
+
+        self.assertEqual(closed, [True])
+        self.assertIsNone(self.gi._DB_POOL)
+
     def test_update_invoice_sheets_creates_missing_known_sheet_from_template(self):
         batch_requests = []
         value_updates = []
@@ -386,6 +473,190 @@ class ProfitSummaryTests(unittest.TestCase):
         self.assertEqual(values_by_range[f"'{sheet_name}'!F16"], 1_100)
         self.assertEqual(values_by_range[f"'{sheet_name}'!F17"], 15_000)
 
+    def _attachment_business_data(self):
+        rows = [
+            (self.gi.date(2026, 6, 1), "중구 장충단로 225", 7, 3, 12, 18, 4, 0, 0),
+            (self.gi.date(2026, 6, 1), "서대문구 연희로4길 25-7", 10, 5, 20, 30, 0, 0, 0),
+            (self.gi.date(2026, 6, 2), "동대문구 회기로 189", 2, 2, 4, 6, 0, 0, 0),
+        ]
+        return self.gi.aggregate_by_business(rows)
+
+    def _assert_invoice_attachments(self, attachments):
+        self.assertEqual([filename for filename, _ in attachments], [
+            "2026년 6월 거래명세서 (주식회사 모어브릿지).pdf",
+            "2026년 6월 거래명세서 (주식회사 콥스).pdf",
+            "2026년 6월 거래명세서 (오를리(Orly)).pdf",
+            "2026년 6월 세금계산서 (홈택스).xlsx",
+        ])
+        for filename, buffer in attachments[:-1]:
+            self.assertTrue(buffer.getvalue().startswith(b"%PDF"), filename)
+        self.assertTrue(attachments[-1][1].getvalue().startswith(b"PK"))
+
+    def test_generate_attachments_renders_in_process_for_few_businesses(self):
+        business_data = self._attachment_business_data()
+
+        with patch.object(self.gi, "ProcessPoolExecutor", side_effect=AssertionError("pool should not start")):
+            attachments = self.gi.generate_attachments(business_data, 2026, 6)
+
+        self._assert_invoice_attachments(attachments)
+
+    def test_generate_attachments_renders_with_process_pool(self):
+        business_data = self._attachment_business_data()
+        self.gi.PDF_POOL_MIN_BUSINESSES = 1
+        scripts_dir = str(Path(self.gi.__file__).resolve().parent)
+
+        with patch.dict(sys.modules, {"generate_invoices": self.gi}), \
+                patch.object(sys, "path", [scripts_dir] + sys.path):
+            attachments = self.gi.generate_attachments(business_data, 2026, 6)
+
+        self._assert_invoice_attachments(attachments)
+
+    def test_pdf_font_registration_runs_once_per_process(self):
+        calls = []
+        self.gi.register_font = lambda: calls.append(True) or True
+
+        with patch.object(self.gi.pdfmetrics, "getRegisteredFontNames", lambda: []):
+            self.assertEqual(self.gi._get_font_name(), "Korean")
+            self.assertEqual(self.gi._get_font_name(), "Korean")
+        self.assertEqual(len(calls), 1)
+        self.assertIs(self.gi._get_pdf_styles("Korean"), self.gi._get_pdf_styles("Korean"))
+
+    def test_pdf_price_labels_follow_location_price_overrides(self):
+        self.assertEqual(self.gi._get_price_labels("중구 장충단로 225")["body_towel"], "1,100원")
+        self.assertEqual(self.gi._get_price_labels("동대문구 회기로 189")["mat"], "1,500원")
+        self.assertEqual(self.gi._get_price_labels("강남구 봉은사로37길 8")["mat"], "2,000원")
+
+    def test_pdf_font_reuses_already_registered_korean_font(self):
+        self.gi.register_font = lambda: self.fail("registered font should be reused")
+
+        with patch.object(self.gi.pdfmetrics, "getRegisteredFontNames", lambda: ["Helvetica", "Korean"]):
+            self.assertEqual(self.gi._get_font_name(), "Korean")
+
+    def test_send_emails_reuses_one_smtp_session(self):
+        sessions = []
+
+        class FakeSMTP:
+            def __init__(self, host, port):
+                self.logins = []
+                self.sent = []
+                sessions.append(self)
+
+            def login(self, user, password):
+                self.logins.append(user)
+
+            def send_message(self, msg):
+                self.sent.append(msg["Subject"])
+                return {}
+
+            def quit(self):
+                pass
+
+            def close(self):
+                pass
+
+        self.gi.EMAIL_PASSWORD = "secret"
+        messages = [
+            self.gi.build_email("first", "body", []),
+            self.gi.build_email("second", "body", []),
+        ]
+
+        with patch.object(self.gi.smtplib, "SMTP_SSL", FakeSMTP):
+            self.assertTrue(self.gi.send_emails(messages))
+
+        self.assertEqual(len(sessions), 1)
+        self.assertEqual(len(sessions[0].logins), 1)
+        self.assertEqual(sessions[0].sent, ["first", "second"])
+
+    def test_send_emails_attempts_every_message_when_one_fails(self):
+        sessions = []
+
+        class FakeSMTP:
+            def __init__(self, host, port):
+                self.sent = []
+                sessions.append(self)
+
+            def login(self, user, password):
+                pass
+
+            def send_message(self, msg):
+                if msg["Subject"] == "report":
+                    raise self_smtplib.SMTPServerDisconnected("dropped")
+                self.sent.append(msg["Subject"])
+                return {}
+
+            def quit(self):
+                pass
+
+            def close(self):
+                pass
+
+        self_smtplib = self.gi.smtplib
+        self.gi.EMAIL_PASSWORD = "secret"
+        messages = [
+            self.gi.build_email("report", "body", []),
+            self.gi.build_email("invoice", "body", []),
+        ]
+
+        with patch.object(self.gi.smtplib, "SMTP_SSL", FakeSMTP):
+            self.assertFalse(self.gi.send_emails(messages))
+
+        self.assertEqual(len(sessions), 2)
+        self.assertEqual(sessions[1].sent, ["invoice"])
+
+    def test_build_email_attaches_full_buffer_regardless_of_position(self):
+        buffer = self.gi.BytesIO(b"%PDF-1.4 invoice")
+        buffer.read()
+
+        msg = self.gi.build_email("subject", "body", [("invoice.pdf", buffer)])
+        attachment = msg.get_payload()[1]
+
+        self.assertEqual(attachment.get_filename(), "invoice.pdf")
+        self.assertEqual(attachment.get_payload(decode=True), b"%PDF-1.4 invoice")
+
+    def test_monthly_query_uses_record_date_range_and_pooled_connection(self):
+        captured = {}
+
+        class FakeCursor:
+            def execute(self, sql, params):
+                captured["sql"] = sql
+                captured["params"] = params
+
+            def fetchall(self):
+                return []
+
+            def close(self):
+                pass
+
+        class FakeConnection:
+            closed = 0
+            info = SimpleNamespace(transaction_status=self.gi.psycopg2.extensions.TRANSACTION_STATUS_IDLE)
+
+            def cursor(self):
+                return FakeCursor()
+
+            def close(self):
+                pass
+
+        connections = []
+
+        def fake_connect(uri):
+            connections.append(FakeConnection())
+            return connections[-1]
+
+        with patch.object(self.gi.psycopg2, "connect", fake_connect):
+            self.assertEqual(self.gi.get_monthly_data(2026, 6), [])
+            self.assertEqual(self.gi.get_monthly_data(2026, 6), [])
+
+        self.assertEqual(len(connections), 1)
+
+        self.assertNotIn("EXTRACT", captured["sql"].upper())
+        self.assertIn("record_date >= %s", captured["sql"])
+        self.assertIn("record_date < %s", captured["sql"])
+        self.assertEqual(
+            captured["params"],
+            (self.gi.date(2026, 5, 31), self.gi.date(2026, 6, 30)),
+        )
+
 
 if __name__ == "__main__":
     unittest.main()